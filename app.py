@@ -1,65 +1,95 @@
 import csv
-import re
 import string
-from collections import defaultdict
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+import heapq
 import math
+import multiprocessing
+import os
+import pickle
+from functools import lru_cache
+from operator import itemgetter
+import numpy as np
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
-from flask import Flask, render_template, request
+from flask import Blueprint, Flask, render_template, request
 
-app = Flask(__name__)
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
 
-def preprocess_data(csv_file):
+bp = Blueprint('search', __name__)
+
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+_STOPWORDS = frozenset(stopwords.words('english'))
+_STEMMER = PorterStemmer()
+# Titles and author names repeat heavily across the catalog, so memoize stems
+_stem = lru_cache(maxsize=200_000)(_STEMMER.stem)
+
+def preprocess_data(csv_file, processes=None):
     """
     Preprocesses the book data from a CSV file for indexing.
     
     Args:
         csv_file (str): The path to the CSV file containing book data.
+        processes (int): The number of worker processes to use (defaults to the CPU count).
         
     Returns:
         list: A list of preprocessed book records, where each record is a dictionary
               containing the book's title, author, and description fields.
     """
-    stop_words = set(stopwords.words('english'))
-    stemmer = PorterStemmer()
-    preprocessed_data = []
-    
-    with open(csv_file, 'r') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            title = preprocess_text(row['title'], stop_words, stemmer)
-            author = preprocess_text(row['authors'], stop_words, stemmer)
-            description = preprocess_text(row['text_reviews_count'], stop_words, stemmer)
-            
-            preprocessed_data.append({
-                'title': title,
-                'author': author,
-                'description': description
-            })
-            
-    return preprocessed_data
+    with open(csv_file, 'r', newline='', buffering=1 << 20) as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        title_col = header.index('title')
+        author_col = header.index('authors')
+        # The catalog has no free-text description, so the publisher fills that field. A few
+        # rows carry an unquoted comma in the authors column, so count it from the end.
+        description_col = header.index('publisher') - len(header)
+        rows = [(row[title_col], row[author_col], row[description_col]) for row in reader]
+    
+    processes = processes or os.cpu_count() or 1
+    # Forked workers inherit the loaded stopwords and stemmer instead of re-importing this module
+    if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            return pool.map(preprocess_row, rows, chunksize=1024)
+    return [preprocess_row(row) for row in rows]
 
-def preprocess_text(text, stop_words, stemmer):
+def preprocess_row(row):
+    """
+    Preprocesses the fields of a single book record.
+    
+    Args:
+        row (tuple): The book's raw title, author, and description.
+        
+    Returns:
+        dict: The book's preprocessed title, author, and description fields.
+    """
+    title, author, description = row
+    return {
+        'title': preprocess_text(title),
+        'author': preprocess_text(author),
+        'description': preprocess_text(description)
+    }
+
+def preprocess_text(text):
     """
     Preprocesses a given text by removing punctuation, converting to lowercase,
     removing stop words, and stemming the remaining words.
     
     Args:
         text (str): The input text to be preprocessed.
-        stop_words (set): A set of stop words to be removed.
-        stemmer (PorterStemmer): A PorterStemmer object for stemming words.
         
     Returns:
         str: The preprocessed text.
     """
-    # Remove punctuation and convert to lowercase
-    text = re.sub(r'[{}]'.format(string.punctuation), '', text.lower())
-    
-    # Tokenize the text into words
-    words = text.split()
+    # Convert to lowercase, remove punctuation and tokenize the text into words
+    words = text.lower().translate(_PUNCT_TABLE).split()
     
     # Remove stop words and stem the remaining words
-    preprocessed_words = [stemmer.stem(word) for word in words if word not in stop_words]
+    preprocessed_words = [_stem(word) for word in words if word not in _STOPWORDS]
     
     # Join the preprocessed words back into a single string
     preprocessed_text = ' '.join(preprocessed_words)
@@ -68,9 +98,16 @@ def preprocess_text(text, stop_words, stemmer):
 
 
 
+# Bit flags recording which fields of a book contain a term
+FIELD_BITS = {'title': 1, 'author': 2, 'description': 4}
+FIELD_SHIFT = 3
+
 class InvertedIndex:
     def __init__(self):
-        self.index = defaultdict(list)
+        self.term_to_id = {}
+        self.id_to_term = []
+        self.index = defaultdict(lambda: defaultdict(int))
+        self.num_docs = 0
         
     def index_data(self, documents):
         """
@@ -79,6 +116,7 @@ class InvertedIndex:
         Args:
             documents (list): A list of Document objects.
         """
+        self.num_docs = len(documents)
         for doc in documents:
             title_tokens = doc.title.split()
             author_tokens = doc.author.split()
@@ -88,6 +126,8 @@ class InvertedIndex:
             self.add_tokens_to_index(doc.doc_id, author_tokens, 'author')
             self.add_tokens_to_index(doc.doc_id, description_tokens, 'description')
             
+        self.finalize()
+            
     def add_tokens_to_index(self, book_id, tokens, field):
         """
         Adds tokens from a specific field of a book to the inverted index.
@@ -97,8 +137,24 @@ class InvertedIndex:
             tokens (list): A list of tokens (words) to be indexed.
             field (str): The field from which the tokens were extracted (e.g., 'title', 'author', 'description').
         """
+        field_bit = FIELD_BITS[field]
         for token in tokens:
-            self.index[(token, field)].append(book_id)
+            term_id = self.term_to_id.get(token)
+            if term_id is None:
+                term_id = self.term_to_id[token] = len(self.id_to_term)
+                self.id_to_term.append(token)
+            self.index[term_id][book_id] |= field_bit
+            
+    def finalize(self):
+        """
+        Packs each term's postings into a single sorted array of (book_id << 3) | field_bits
+        entries, stored in a list indexed by term ID.
+        """
+        self.index = [
+            np.array(sorted((book_id << FIELD_SHIFT) | field_bits
+                            for book_id, field_bits in self.index[term_id].items()), dtype=np.uint32)
+            for term_id in range(len(self.id_to_term))
+        ]
             
     def search(self, query):
         """
@@ -108,67 +164,239 @@ class InvertedIndex:
             query (str): The search query.
             
         Returns:
-            list: A list of book IDs that match the search query.
+            np.ndarray: The sorted IDs of the books that match the search query.
         """
         query_tokens = query.split()
-        matching_book_ids = []
+        # Union the posting lists by marking matching books in a bitset
+        matches = np.zeros(self.num_docs, dtype=bool)
         
         for token in query_tokens:
-            book_ids_for_token = self.index.get((token, 'title'), []) + \
-                                 self.index.get((token, 'author'), []) + \
-                                 self.index.get((token, 'description'), [])
-            matching_book_ids.extend(book_ids_for_token)
+            term_id = self.term_to_id.get(token)
+            if term_id is not None:
+                matches[self.index[term_id] >> FIELD_SHIFT] = True
             
-        return list(set(matching_book_ids))
+        return np.flatnonzero(matches)
     
+@dataclass(frozen=True)
 class Document:
-    def __init__(self, doc_id, title, author, description):
-        self.doc_id = doc_id
-        self.title = title
-        self.author = author
-        self.description = description
-        self.text = ' '.join([title, author, description])
-        self.term_frequencies = {}
-        self.length = len(self.text.split())
-
-    def compute_term_frequencies(self, index):
-        for term in set(self.text.split()):
-            self.term_frequencies[term] = self.text.count(term) / self.length
+    doc_id: int
+    title: str
+    author: str
+    description: str
+
+if _NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _score_documents(doc_ids, query_term_ids, query_weights, indptr, indices, data, scores):
+        """
+        Scores the given documents against the query over a CSR term frequency matrix.
+        
+        Args:
+            doc_ids (np.ndarray): IDs of the candidate documents to score.
+            query_term_ids (np.ndarray): Term IDs of the query terms.
+            query_weights (np.ndarray): Weight of each query term (IDF times query term weight).
+            indptr (np.ndarray): Row offsets of the term frequency matrix, one row per document.
+            indices (np.ndarray): Term ID of each stored term frequency.
+            data (np.ndarray): Stored term frequencies.
+            scores (np.ndarray): Output array receiving one score per candidate document.
+        """
+        for i in prange(doc_ids.shape[0]):
+            doc_id = doc_ids[i]
+            score = 0.0
+            for k in range(indptr[doc_id], indptr[doc_id + 1]):
+                term_id = indices[k]
+                for j in range(query_term_ids.shape[0]):
+                    if query_term_ids[j] == term_id:
+                        score += data[k] * query_weights[j]
+            scores[i] = score
 
 class SearchEngine:
     def __init__(self, documents):
-        self.documents = documents
+        self.num_docs = len(documents)
         self.index = InvertedIndex()
         self.index.index_data(documents)
+        self.term_to_id = self.index.term_to_id
         self.idf_scores = self.compute_idf_scores()
+        # The per-field arrays are only needed to build the term matrix, so they are not kept
+        self.build_term_matrix(*self.build_field_arrays(documents))
+
+    def build_field_arrays(self, documents):
+        """
+        Converts the corpus into parallel per-field arrays of term IDs, one entry per document.
+        
+        Args:
+            documents (list): A list of Document objects.
+            
+        Returns:
+            tuple: The title, author, and description term ID arrays.
+        """
+        def to_term_ids(text):
+            tokens = text.split()
+            return np.fromiter((self.term_to_id[token] for token in tokens), dtype=np.int32, count=len(tokens))
+
+        title_ids = [to_term_ids(doc.title) for doc in documents]
+        author_ids = [to_term_ids(doc.author) for doc in documents]
+        description_ids = [to_term_ids(doc.description) for doc in documents]
+        return title_ids, author_ids, description_ids
+
+    def build_term_matrix(self, title_ids, author_ids, description_ids):
+        """
+        Builds a CSR matrix of document term frequencies keyed by integer term IDs.
+        
+        Args:
+            title_ids (list): The title term ID array of each document.
+            author_ids (list): The author term ID array of each document.
+            description_ids (list): The description term ID array of each document.
+        """
+        indptr = [0]
+        indices = [np.empty(0, dtype=np.int32)]
+        data = [np.empty(0, dtype=np.float64)]
+        for fields in zip(title_ids, author_ids, description_ids):
+            tokens = np.concatenate(fields)
+            term_ids, counts = np.unique(tokens, return_counts=True)
+            indices.append(term_ids)
+            data.append(counts / max(len(tokens), 1))
+            indptr.append(indptr[-1] + len(term_ids))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.concatenate(indices).astype(np.int32)
+        self.data = np.concatenate(data)
+
+    def get_state(self):
+        """
+        Returns the engine's data as plain containers and numpy arrays, so a pickled
+        index does not depend on the module path these classes were loaded from.
+        
+        Returns:
+            dict: The data needed by from_state() to restore the engine.
+        """
+        return {
+            'num_docs': self.num_docs,
+            'id_to_term': self.index.id_to_term,
+            'postings': self.index.index,
+            'idf_scores': self.idf_scores,
+            'indptr': self.indptr,
+            'indices': self.indices,
+            'data': self.data,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores an engine from the data returned by get_state().
+        
+        Args:
+            state (dict): The engine's data.
+            
+        Returns:
+            SearchEngine: The restored engine.
+        """
+        index = InvertedIndex()
+        index.num_docs = state['num_docs']
+        index.id_to_term = state['id_to_term']
+        index.term_to_id = {term: term_id for term_id, term in enumerate(index.id_to_term)}
+        index.index = state['postings']
+        
+        engine = cls.__new__(cls)
+        engine.num_docs = state['num_docs']
+        engine.index = index
+        engine.term_to_id = index.term_to_id
+        engine.idf_scores = state['idf_scores']
+        engine.indptr = state['indptr']
+        engine.indices = state['indices']
+        engine.data = state['data']
+        return engine
 
     def compute_idf_scores(self):
-        idf_scores = {}
-        num_docs = len(self.documents)
-        for term_field, doc_list in self.index.index.items():
-            term, _ = term_field  # Extract the term from the tuple
-            idf_scores[term.lower()] = math.log(num_docs / (1 + len(doc_list)))
-        return idf_scores
+        """
+        Computes the IDF of every indexed term.
+        
+        Returns:
+            np.ndarray: A float32 array of IDF scores indexed by term ID.
+        """
+        num_docs = self.num_docs
+        # Each book has a single posting entry, whichever fields contain the term
+        doc_freqs = np.fromiter(map(len, self.index.index), dtype=np.float64, count=len(self.index.index))
+        return np.log(num_docs / (1 + doc_freqs)).astype(np.float32)
 
 
-    def search(self, query):
-        query_terms = query.lower().split()
-        query_vector = {}
-        for term in query_terms:
-            query_vector[term] = query_terms.count(term)
+    def search(self, query, max_k=200):
+        """
+        Ranks the books against a raw search query.
+        
+        Args:
+            query (str): The search query as typed by the user.
+            max_k (int): The maximum number of results to return.
+            
+        Returns:
+            list: The top (doc_id, score) pairs, best first.
+        """
+        # The index holds stemmed tokens without stop words, so the query must match
+        return self.rank(preprocess_text(query), max_k)
 
+    def rank(self, query, max_k=200):
+        """
+        Ranks the books against a query that has already been through preprocess_text.
+        
+        Args:
+            query (str): The preprocessed search query.
+            max_k (int): The maximum number of results to return.
+            
+        Returns:
+            list: The top (doc_id, score) pairs, best first.
+        """
+        query_vector = Counter(term for term in query.split() if term in self.term_to_id)
+        num_terms = len(query_vector)
+        query_term_ids = np.fromiter((self.term_to_id[term] for term in query_vector),
+                                     dtype=np.int32, count=num_terms)
+        query_counts = np.fromiter(query_vector.values(), dtype=np.float64, count=num_terms)
+
+        # Fold the IDF and query term weight into a single factor per term
+        query_weights = self.idf_scores[query_term_ids] * (1 + query_counts)
+
+        # Only documents that contain at least one query term can score above zero
+        candidates = self.index.search(query)
+
+        if _NUMBA_AVAILABLE:
+            return self.score_with_kernel(candidates, query_term_ids, query_weights, max_k)
+
+        term_weights = dict(zip(query_term_ids.tolist(), query_weights.tolist()))
         ranking = []
-        for doc in self.documents:
-            score = 0
-            for term in query_vector:
-                if term in doc.term_frequencies:
-                    tf = doc.term_frequencies[term]
-                    idf = self.idf_scores[term]
-                    score += tf * idf * (1 + query_vector[term])
-            ranking.append((doc.doc_id, score))
-
-        ranking.sort(key=lambda x: x[1], reverse=True)
-        return ranking
+        for doc_id in candidates.tolist():
+            row = slice(self.indptr[doc_id], self.indptr[doc_id + 1])
+            score = 0.0
+            for term_id, tf in zip(self.indices[row].tolist(), self.data[row].tolist()):
+                if term_id in term_weights:
+                    score += tf * term_weights[term_id]
+            ranking.append((doc_id, score))
+
+        return heapq.nlargest(max_k, ranking, key=itemgetter(1))
+
+    def score_with_kernel(self, candidates, query_term_ids, query_weights, max_k):
+        """
+        Ranks the candidate documents with the compiled scoring kernel.
+        
+        Args:
+            candidates (np.ndarray): Sorted IDs of the documents containing at least one query term.
+            query_term_ids (np.ndarray): Term IDs of the query terms present in the index.
+            query_weights (np.ndarray): Weight of each query term.
+            max_k (int): The maximum number of results to return.
+            
+        Returns:
+            list: The top (doc_id, score) pairs, best first.
+        """
+        if not len(candidates):
+            return []
+        scores = np.empty(len(candidates), dtype=np.float64)
+        _score_documents(candidates, query_term_ids, query_weights, self.indptr, self.indices, self.data, scores)
+
+        if len(scores) > max_k:
+            # Keep every score tied with the k-th best, then break ties by doc ID
+            # so the cut matches the pure Python path
+            kth_score = -np.partition(-scores, max_k - 1)[max_k - 1]
+            top = np.flatnonzero(scores >= kth_score)
+            order = top[np.lexsort((candidates[top], -scores[top]))][:max_k]
+        else:
+            order = np.argsort(-scores, kind='stable')
+        return list(zip(candidates[order].tolist(), scores[order].tolist()))
 
     def display_results(self, ranking, threshold=0.5, page_size=10):
         if not ranking:
@@ -182,9 +410,6 @@ class SearchEngine:
             print(f"No matching books found above threshold {threshold}.")
             return
         
-        # Sort results by score
-        filtered_ranking.sort(key=lambda x: x[1], reverse=True)
-        
         # Paginate results
         num_pages = math.ceil(len(filtered_ranking) / page_size)
         
@@ -195,56 +420,115 @@ class SearchEngine:
             
             for idx in range(start_index, end_index):
                 doc_id, score = filtered_ranking[idx]
-                doc = search_engine.documents[doc_id]
-                original_book_info = preprocessed_books[doc.doc_id]  # Fetch original book info
-                print(f"Book ID: {doc.doc_id}, Title: {original_book_info['title']}, Author: {original_book_info['author']}, Score: {score:.2f}")
+                original_book_info = preprocessed_books[doc_id]  # Fetch original book info
+                print(f"Book ID: {doc_id}, Title: {original_book_info['title']}, Author: {original_book_info['author']}, Score: {score:.2f}")
+
+
+# Bump whenever the pickled index layout changes so stale index files get rebuilt
+INDEX_VERSION = 7
+
+def build_or_load(csv_file='books.csv', index_path='index.pkl'):
+    """
+    Loads the prebuilt search index, rebuilding it when the book data is newer.
+    
+    Args:
+        csv_file (str): The path to the CSV file containing book data.
+        index_path (str): The path of the pickled index.
+        
+    Returns:
+        tuple: The preprocessed book records and the SearchEngine built from them.
+    """
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(csv_file):
+        try:
+            with open(index_path, 'rb') as file:
+                version, preprocessed_books, state = pickle.load(file)
+            if version == INDEX_VERSION:
+                return preprocessed_books, SearchEngine.from_state(state)
+        except (OSError, EOFError, AttributeError, ImportError, KeyError, ValueError, pickle.UnpicklingError):
+            pass  # Unreadable index file, fall through and rebuild it
+    
+    preprocessed_books = preprocess_data(csv_file)
+    documents = [Document(book_id, book['title'], book['author'], book['description'])
+                 for book_id, book in enumerate(preprocessed_books)]
+    search_engine = SearchEngine(documents)
+    
+    # Only plain data is pickled, so an index written under `python app.py` (where the
+    # classes live in __main__) is still readable after `import app`, and vice versa.
+    # Write to a temporary file first so a concurrent reader never sees a partial pickle
+    tmp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump((INDEX_VERSION, preprocessed_books, search_engine.get_state()), file, protocol=5)
+    os.replace(tmp_path, index_path)
+    return preprocessed_books, search_engine
 
+# Populated by create_app()
+preprocessed_books = None
+search_engine = None
 
-preprocessed_books = preprocess_data('books.csv')
-documents = []
-for book_id, book in enumerate(preprocessed_books):
-    title = book['title']
-    author = book['author']
-    description = book['description']
-    doc = Document(book_id, title, author, description)
-    doc.compute_term_frequencies(InvertedIndex())
-    documents.append(doc)
-search_engine = SearchEngine(documents)
 
+RESULT_TEMPLATE = "Book ID: {doc_id}, Title: {title}, Author: {author}, Score: {score:.2f}<br>"
 
 def display_results(ranking):
     if not ranking:
         return "No matching books found."
-    else:
-        results = []
-        filtered_ranking = [(doc_id, score) for doc_id, score in ranking if score >= 1.0]
-        if not filtered_ranking:
-            return f"No matching books found above threshold 1.0."
-        else:
-            filtered_ranking.sort(key=lambda x: x[1], reverse=True)
-            num_pages = min(len(filtered_ranking) // 5 + 1, 10)
-
-            for page_num in range(num_pages):
-                results.append(f"Page {page_num + 1}:<br>")
-                start_index = page_num * 5
-                end_index = min(start_index + 5, len(filtered_ranking))
-
-                for idx in range(start_index, end_index):
-                    doc_id, score = filtered_ranking[idx]
-                    doc = search_engine.documents[doc_id]
-                    original_book_info = preprocessed_books[doc.doc_id]
-                    results.append(f"Book ID: {doc.doc_id}, Title: {original_book_info['title']}, Author: {original_book_info['author']}, Score: {score:.2f}<br>")
-                results.append("<br>")
-        return ''.join(results)
-
-@app.route('/', methods=['GET', 'POST'])
+    filtered_ranking = [(doc_id, score) for doc_id, score in ranking if score >= 1.0]
+    if not filtered_ranking:
+        return f"No matching books found above threshold 1.0."
+
+    def format_page(page_slice):
+        return ''.join(
+            RESULT_TEMPLATE.format(doc_id=doc_id, title=preprocessed_books[doc_id]['title'],
+                                   author=preprocessed_books[doc_id]['author'], score=score)
+            for doc_id, score in page_slice)
+
+    num_pages = min(len(filtered_ranking) // 5 + 1, 10)
+    return ''.join(
+        f"Page {page_num + 1}:<br>{format_page(filtered_ranking[page_num * 5:page_num * 5 + 5])}<br>"
+        for page_num in range(num_pages))
+
+@lru_cache(maxsize=1024)
+def cached_search(query):
+    """
+    Runs a search and renders its results, memoizing the HTML per preprocessed query.
+    
+    Args:
+        query (str): The preprocessed search query.
+        
+    Returns:
+        str: The rendered search results.
+    """
+    ranking = search_engine.rank(query)
+    return display_results(ranking)
+
+@bp.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        query = request.form['query']
-        ranking = search_engine.search(query)
-        results = display_results(ranking)  # Call the display_results function here
+        query = preprocess_text(request.form['query'])
+        results = cached_search(query)
         return render_template('index.html', results=results)
     return render_template('index.html', results=None)
 
+def create_app(csv_file='books.csv', index_path='index.pkl'):
+    """
+    Loads the search index and creates the Flask application.
+    
+    Under a preforking server such as gunicorn with preload_app, this runs once in the
+    master process and the workers share the loaded index copy-on-write.
+    
+    Args:
+        csv_file (str): The path to the CSV file containing book data.
+        index_path (str): The path of the pickled index.
+        
+    Returns:
+        Flask: The configured application.
+    """
+    global preprocessed_books, search_engine
+    preprocessed_books, search_engine = build_or_load(csv_file, index_path)
+    cached_search.cache_clear()
+    
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,12 @@
+import multiprocessing
+import os
+
+# Each worker already gets its own process, so keep numba's parallel kernel to one thread
+# per worker instead of one per CPU. Set before the app (and numba) is imported.
+os.environ.setdefault('NUMBA_NUM_THREADS', '1')
+
+# Build or load the index once in the master process so workers share it copy-on-write
+wsgi_app = 'app:create_app()'
+preload_app = True
+workers = 2 * multiprocessing.cpu_count() + 1
+bind = '127.0.0.1:8000'